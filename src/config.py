@@ -11,9 +11,11 @@ contains app configuration. Can not be changed by user.
 variables that can be changed by user.
 """
 
+from functools import cached_property
+
 from .geometry import Rect
 from .util import Interval, Color, expScalingFunction
-import src.phylib as phylib
+from . import phylib
 
 
 class Config:
@@ -24,6 +26,10 @@ class Config:
 
     # Time (in ms) between updates of the GUI
     updateInterval = 75
+    # Time (in ms) between updates of clock etc.
+    slowUpdateInterval = 500
+    # Time (in ms) between checks while the window is iconified
+    hiddenUpdateInterval = 250
 
     # Visible universe
     uniRect = Rect(0, 0, 4e8, 2.8e8)
@@ -114,11 +120,38 @@ class Config:
             'planetOutline': Color(60, 60, 100),
             'blackPlanetOutline': Color(120, 120, 40),
             'planetRotor': Color(100, 100, 100),
+            'gravityVector': Color(255, 0, 0),
             'ship': Color(224, 224, 16),
             'shipOutline': Color(224, 16, 16)
             }
 
 
+# Colors as Tk color strings, so they don't have to be converted
+# every time something is drawn
+Config.tkColors = {name: col.tkString() for name, col in Config.colors.items()}
+
+
+# For all of these, we will create two attributes:
+#   1) settings.{name}  will be set to the third value (per instance)
+#   2) Settings.{name}Range will be set to an interval [first, second] value.
+varRanges = {
+        # Scaling values
+        's_planetSize': (-5, 5, 0),
+        's_planetDensity': (-5, 5, 0),
+        's_planetRotation': (-10, 10, 0),
+        's_gravityConstant': (-5, 5, 0),
+        's_animationSpeed': (-3, 3, 0),
+        's_blackDensity': (-5, 5, 0),
+
+        # Absolute values
+        'planetSpread': (1, 4, 2),
+        'nSmallPlanets': (0, 10, 5),
+        'nNormalPlanets': (0, 8, 3),
+        'nLargePlanets': (0, 6, 2),
+        'nBlackPlanets': (0, 3, 0)
+}
+
+
 class Settings:
     """User adjustable settings
 
@@ -126,72 +159,86 @@ class Settings:
     The format is:
         .settingName = value
         .settingNameRange = Interval(min, max)
+
+    Derived values are cached. Settings.set() drops the cached values
+    that depend on the changed setting (see .dependencies).
     """
 
+    # setting name -> derived values that have to be recalculated
+    dependencies = {
+            's_planetSize': ('planetSize',
+                             'planetRadiusNormal',
+                             'planetRadiusLarge',
+                             'planetRadiusSmall',
+                             'planetRadiusBlack'),
+            's_planetDensity': ('planetDensity',
+                                'planetDensityNormal',
+                                'planetDensityLarge',
+                                'planetDensitySmall',
+                                'planetDensityBlack'),
+            's_blackDensity': ('planetDensityBlack',),
+            's_planetRotation': ('planetRotation',),
+            's_gravityConstant': ('gravityConstant',),
+            's_animationSpeed': ('animationSpeed',)
+    }
+
+    # Setting values live in slots, __dict__ holds the cached values
+    __slots__ = tuple(varRanges) + ('__dict__',)
+
+    def __init__(self):
+        for name, defn in varRanges.items():
+            setattr(self, name, defn[2])
+
     def set(self, k, v):
-        """Only set values for already existing attributes and check range"""
+        """Only set values for known settings and check range"""
 
-        if not hasattr(self, k):
+        interval = self.ranges.get(k)
+        if interval is None:
             raise Exception('No such setting: ' + k)
-        interval = getattr(self, k + 'Range', None)
+        if getattr(self, k) == v:
+            return
         if v is not None and v not in interval:
             raise Exception('Value {v} for {n} out of range ({min}, {max})'.format(
                     v=v, n=k, min=interval.start, max=interval.end))
         setattr(self, k, v)
+        for name in self.dependencies.get(k, ()):
+            self.__dict__.pop(name, None)
 
     def get(self, k):
         return getattr(self, k)
 
-    @property
+    @cached_property
     def planetRadiusNormal(self): return self.planetSize
-    @property
+    @cached_property
     def planetRadiusLarge(self): return self.planetSize*Config.fRadiusLarge
-    @property
+    @cached_property
     def planetRadiusSmall(self): return self.planetSize*Config.fRadiusSmall
-    @property
+    @cached_property
     def planetRadiusBlack(self): return self.planetSize*Config.fRadiusBlack
-    @property
+    @cached_property
     def planetDensityNormal(self): return self.planetDensity
-    @property
+    @cached_property
     def planetDensityLarge(self): return self.planetDensity*Config.fDensityLarge
-    @property
+    @cached_property
     def planetDensitySmall(self): return self.planetDensity*Config.fDensitySmall
-    @property
+    @cached_property
     def planetDensityBlack(self):
         d = self.planetDensity*Config.fDensityBlack
         return Config.scaleFunc(d, self.s_blackDensity)
-    @property
+    @cached_property
     def planetSize(self): return Config.scaleFunc(Config.planetSize, self.s_planetSize)
-    @property
+    @cached_property
     def planetDensity(self): return Config.scaleFunc(Config.planetDensity, self.s_planetDensity)
-    @property
+    @cached_property
     def planetRotation(self): return Config.scaleFunc(Config.planetRotation, self.s_planetRotation)
-    @property
+    @cached_property
     def gravityConstant(self): return Config.scaleFunc(Config.gravityConstant, self.s_gravityConstant)
-    @property
+    @cached_property
     def animationSpeed(self): return Config.scaleFunc(Config.timeFactor, self.s_animationSpeed)
 
 
-# For all of these, we will create two attributes:
-#   1) Settings.{name}  will be set to the third value
-#   2) Settings.{name}Range will be set to an interval [first, second] value.
-varRanges = {
-        # Scaling values
-        's_planetSize': (-5, 5, 0),
-        's_planetDensity': (-5, 5, 0),
-        's_planetRotation': (-10, 10, 0),
-        's_gravityConstant': (-5, 5, 0),
-        's_animationSpeed': (-3, 3, 0),
-        's_blackDensity': (-5, 5, 0),
-
-        # Absolute values
-        'planetSpread': (1, 4, 2),
-        'nSmallPlanets': (0, 10, 5),
-        'nNormalPlanets': (0, 8, 3),
-        'nLargePlanets': (0, 6, 2),
-        'nBlackPlanets': (0, 3, 0)
-}
-
+# Ranges are shared by all instances
+Settings.ranges = {}
 for name, defn in varRanges.items():
-    setattr(Settings, name, defn[2])
-    setattr(Settings, name + 'Range', Interval(defn[0], defn[1]))
+    Settings.ranges[name] = Interval(defn[0], defn[1])
+    setattr(Settings, name + 'Range', Settings.ranges[name])
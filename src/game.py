@@ -5,15 +5,25 @@ import random
 from .config import Config
 from .geometry import Point, Rect
 from .physics import Body, Universe, Trajectory, SurfaceOrbit
-from .util import randomFloat, randomPointRect, log
+from .util import randomFloat, randomPointsRect, log
 
 
 class PlanetType:
-    def __init__(self, name, radius, density, count):
+    """Properties shared by all planets of one type
+
+    @name         type name
+    @radius       radius of planet
+    @density      density of planet
+    @count        number of planets to create
+    @rotating     whether planets of this type rotate
+    """
+
+    def __init__(self, name, radius, density, count, rotating=True):
         self.name = name
         self.radius = radius
         self.density = density
         self.count = count
+        self.rotating = rotating
 
 
 class Planet(Body):
@@ -28,7 +38,7 @@ class Planet(Body):
     def __init__(self, pos, pType, rotation):
         Body.__init__(self,
                       type=pType.name,
-                      pos=pos.copy(),
+                      pos=pos,
                       radius=pType.radius,
                       rotation=rotation,
                       density=pType.density)
@@ -115,17 +125,18 @@ class Ship:
         self.flightLength = sum(path.length() for path in self.paths if isinstance(path, Trajectory))
         self.gameVariables.flightLength = self.flightLength
 
-    def positionAt(self, t):
+    def positionAt(self, t, out=None):
+        """Return ship position at time t (stored in Point out, if given)"""
         # Fast path
         path = self.paths[-1]
-        pos = path.positionAt(t)
+        pos = path.positionAt(t, out)
         if pos is not None:
             return pos
 
         # So we are looking for a position in the past...
         for path in self.paths:
             if path.startTime <= t <= path.endTime:
-                pos = path.positionAt(t)
+                pos = path.positionAt(t, out)
                 assert pos is not None
                 return pos
 
@@ -175,7 +186,8 @@ class Game:
                 'black': PlanetType('black',
                                     radius=settings.planetRadiusBlack,
                                     density=settings.planetDensityBlack,
-                                    count=settings.nBlackPlanets)
+                                    count=settings.nBlackPlanets,
+                                    rotating=False)
         }
         self.resetCounters()
 
@@ -280,7 +292,12 @@ class PlanetGenerator:
         self.planets = None
         self.startPlanet = None
         self.targetPlanet = None
-        self.aBodies = None
+
+        # Centers and radii of created planets, used for collision checks
+        maxPlanets = 2 + sum(pt.count for pt in planetTypes.values())
+        self.aCenters = np.zeros((maxPlanets, 2), dtype=np.double)
+        self.aRadii = np.zeros(maxPlanets, dtype=np.double)
+        self.nPlanets = 0
 
     def randomPlanetRotation(self):
         aSpeed = self.settings.planetRotation
@@ -292,22 +309,31 @@ class PlanetGenerator:
         log('PlanetGenerator', 'Creating planets')
         self.createStartAndTarget()
 
-        for tries in range(5):
-            self.planets = [self.startPlanet, self.targetPlanet]
-            # Better to try larger planets first
-            if not self.addPlanets(self.pTypes['large']):
-                continue
-            if not self.addPlanets(self.pTypes['normal']):
-                continue
-            if not self.addPlanets(self.pTypes['small']):
-                continue
-            if self.addPlanets(self.pTypes['black']):
+        # Better to try larger planets first
+        pTypes = [self.pTypes[name] for name in ('large', 'normal', 'small', 'black')]
+        spread = self.spread
+        for tries in range(6):
+            if tries == 5:
+                # Planets don't seem to fit, move them a bit closer together
+                self.spread = spread*0.9
+                log('PlanetGenerator', 'Reducing planet distance to {}'.format(self.spread))
+            self.resetPlanets()
+            if all(self.addPlanets(pt) for pt in pTypes):
                 return
         raise Exception("Failed to create planets")
 
-        self.aBodies = np.zeros((len(self.planets), 6), dtype=np.double)
-        for i, p in enumerate(self.planets):
-            self.aBodies[i] = (p.pos.x, p.pos.y, p.radius, p.rotation, p.density, -1., 0)
+    def resetPlanets(self):
+        self.planets = []
+        self.nPlanets = 0
+        self.addPlanet(self.startPlanet)
+        self.addPlanet(self.targetPlanet)
+
+    def addPlanet(self, p):
+        n = self.nPlanets
+        self.aCenters[n] = (p.pos.x, p.pos.y)
+        self.aRadii[n] = p.radius
+        self.nPlanets = n + 1
+        self.planets.append(p)
 
     def createStartAndTarget(self):
         ur = self.uniRect
@@ -329,18 +355,22 @@ class PlanetGenerator:
                                    self.randomPlanetRotation())
 
     # Helper function to find a random position for a planet
-    def findPosition(self, rect, pRadius):
-        for i in range(1000):
-            pos = randomPointRect(rect)
-            success = True
-            for p in self.planets:
-                if pos.distance(p.pos) < (pRadius + p.radius)*self.spread:
-                    success = False
-                    break
-            if success:
-                log('PlanetGenerator', '{} tries to find empty space'.format(i + 1))
-                return pos
-        return None # failed to find a position
+    def findPosition(self, rect, pRadius, tries=1000):
+        n = self.nPlanets
+        # Compare squared distances to squared minimal distances
+        minDist2 = (self.aRadii[:n] + pRadius)*self.spread
+        minDist2 *= minDist2
+        # Check all candidates against all planets in one go
+        aPos = randomPointsRect(rect, tries)
+        aDiff = aPos[:, np.newaxis, :] - self.aCenters[np.newaxis, :n, :]
+        aDiff *= aDiff
+        aDist2 = aDiff.sum(axis=2)
+        aFree = (aDist2 >= minDist2).all(axis=1)
+        i = np.argmax(aFree)
+        if not aFree[i]:
+            return None # failed to find a position
+        log('PlanetGenerator', '{} tries to find empty space'.format(i + 1))
+        return Point(aPos[i, 0], aPos[i, 1])
 
     # Helper function to add planets of a given type
     def addPlanets(self, pt):
@@ -353,12 +383,12 @@ class PlanetGenerator:
         for n in range(pt.count):
             pos = self.findPosition(rect, pt.radius)
             if pos is not None:
-                if pt.name == 'black':
-                    rotation = 0
-                else:
+                if pt.rotating:
                     rotation = self.randomPlanetRotation()
+                else:
+                    rotation = 0
                 p = Planet(pos, pt, rotation)
-                self.planets.append(p)
+                self.addPlanet(p)
                 log('PlanetGenerator', 'Created {} planet at ({}, {})'.format(pt.name, pos.x, pos.y))
             else:
                 return False
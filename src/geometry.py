@@ -1,11 +1,12 @@
 """Collection of useful geometry classes and functions"""
 
 
+import math
 import numpy as np
 
 
-PI_2 = np.pi/2
-PI_4 = np.pi/4
+PI_2 = math.pi/2
+PI_4 = math.pi/4
 
 def angleM2Y(a):
     """Convert mathematical angle to angle relative to Y-axis
@@ -24,6 +25,8 @@ Y-angle:      starting at (0, 1), increases clockwise (-inf, inf)
 
 
 class NPAView:
+    __slots__ = ('npa',)
+
     def __init__(self, npa):
         self.npa = npa
 
@@ -66,6 +69,8 @@ class NPAView:
 
 
 class Common2(NPAView):
+    __slots__ = ()
+
     def __init__(self, x, y=None):
         if y is None:
             if type(x) is np.ndarray and len(x) == 2:
@@ -89,6 +94,13 @@ class Common2(NPAView):
     @y.setter
     def y(self, v): self.npa[1] = v
 
+    def set(self, x, y):
+        """Set both components in place"""
+        npa = self.npa
+        npa[0] = x
+        npa[1] = y
+        return self
+
     def __eq__(self, p):
         return self.npa[0] == p.npa[0] and self.npa[1] == p.npa[1]
 
@@ -99,6 +111,8 @@ class Common2(NPAView):
 class Point(Common2):
     """A point in 2D-space"""
 
+    __slots__ = ()
+
     def __init__(self, x, y=None):
         Common2.__init__(self, x, y)
 
@@ -107,7 +121,7 @@ class Point(Common2):
 
     def distance(self, p):
         """Return euclidian distance to point p"""
-        return np.hypot(p.npa[0] - self.npa[0], p.npa[1] - self.npa[1])
+        return math.hypot(p.npa[0] - self.npa[0], p.npa[1] - self.npa[1])
 
     def vector(self, p):
         """Return a vector from Point p1 to Point p2"""
@@ -124,6 +138,8 @@ class Point(Common2):
 class Vector(Common2):
     """A vector in 2D-Space"""
 
+    __slots__ = ()
+
     def __init__(self, x, y=None):
         Common2.__init__(self, x, y)
 
@@ -132,11 +148,11 @@ class Vector(Common2):
 
     def abs(self):
         """Return |V|, the length of this vector"""
-        return np.hypot(self.npa[0], self.npa[1])
+        return math.hypot(self.npa[0], self.npa[1])
 
     def dot(self, v):
         """Dot product"""
-        return np.dot(self.npa, v.npa)
+        return self.npa[0]*v.npa[0] + self.npa[1]*v.npa[1]
 
     def normalize(self):
         """Make this vector have length 1"""
@@ -155,16 +171,18 @@ class Vector(Common2):
 
         Returns a value within [-1, 1]
         """
-        ma = self.npa
-        oa = v.npa
-        return np.dot(ma, oa)/np.sqrt(np.dot(ma, ma)*np.dot(oa, oa))
+        mx, my = self.npa
+        ox, oy = v.npa
+        return (mx*ox + my*oy)/math.sqrt((mx*mx + my*my)*(ox*ox + oy*oy))
 
     def angle(self, v):
         """Angle between self and v
 
         Returns a value within [0, pi]
         """
-        return np.arccos(self.cosAngle(v))
+        # Rounding may push the cosine slightly past +-1 for
+        # (anti)parallel vectors, math.acos would raise then.
+        return math.acos(max(-1.0, min(1.0, self.cosAngle(v))))
 
     def __str__(self):
         return "Vector({},{})".format(*self.npa)
@@ -177,6 +195,8 @@ X_AXIS = Vector(1, 0)
 class Rect:
     """A rectangle"""
 
+    __slots__ = ('npa',)
+
     def __init__(self, x1, y1=None, x2=None, y2=None):
         if type(x1) is np.ndarray and len(x1) == 4:
             self.npa = x1
@@ -210,7 +230,8 @@ class Rect:
     def __contains__(self, p):
         """Returns true if Point p is within this rectangle, else false"""
         r = self.npa
-        return  r[0] <= p.x <= r[2] and r[1] <= p.y <= r[3]
+        pa = p.npa  # skip the .x/.y properties
+        return r[0] <= pa[0] <= r[2] and r[1] <= pa[1] <= r[3]
 
     def copy(self):
         return Rect(*self.npa)
@@ -231,6 +252,8 @@ class Rect:
 class Circle:
     """A circle"""
 
+    __slots__ = ('npa', 'center')
+
     def __init__(self, x, y=None, r=None):
         if type(x) is np.ndarray and len(x) == 3:
             self.npa = x
@@ -250,19 +273,24 @@ class Circle:
 
     def __contains__(self, p):
         c = self.npa
-        return np.hypot(p[0] - c[0], p[1] - c[1]) <= c[2]
+        dx = p[0] - c[0]
+        dy = p[1] - c[1]
+        return dx*dx + dy*dy <= c[2]*c[2]
 
-    def pointAtAngle(self, a):
+    def pointAtAngle(self, a, out=None):
         """Return point P on circle such that y-axis and MP enclose angle a
 
         a increases clockwise
+        If a Point out is given, the result is stored there.
         """
 
         a = angleY2M(a)
-        p = np.array((np.cos(a), np.sin(a)), dtype=np.double)
-        p *= self.npa[2]
-        p += self.npa[0:2]
-        return Point(p)
+        (cx, cy, r) = self.npa
+        x = math.cos(a)*r + cx
+        y = math.sin(a)*r + cy
+        if out is None:
+            return Point(x, y)
+        return out.set(x, y)
 
     def polarAngleTo(self, p):
         """Return angle between y-axis and line MP
@@ -272,7 +300,7 @@ class Circle:
         """
 
         # careful, y component comes first here
-        a = np.arctan2(p[1] - self.npa[1], p[0] - self.npa[0])
+        a = math.atan2(p[1] - self.npa[1], p[0] - self.npa[0])
         return angleM2Y(a)
 
     def intersectFrom(self, I, O):
@@ -287,13 +315,12 @@ class Circle:
         square roots)
         """
 
-        arr = self.npa
-        r = arr[2]
+        cx, cy, r = self.npa
         # Easier to solve if circle has center (0, 0)
-        ix = I[0] - arr[0]
-        iy = I[1] - arr[1]
-        ox = O[0] - arr[0]
-        oy = O[1] - arr[1]
+        ix = I[0] - cx
+        iy = I[1] - cy
+        ox = O[0] - cx
+        oy = O[1] - cy
 
         vx = ox - ix
         vy = oy - iy
@@ -307,14 +334,9 @@ class Circle:
         # t *has* to be positive.
         tmp = b*b - 4*a*c
         assert tmp >= 0
-        t = (-b + np.sqrt(tmp))/(2*a)
+        t = (-b + math.sqrt(tmp))/(2*a)
         # Need to add back center point
-        res = np.array((vx, vy), dtype=np.double)
-        res *= t
-        res += self.npa[0:2]
-        res[0] += ix
-        res[1] += iy
-        return Point(res)
+        return Point(cx + ix + t*vx, cy + iy + t*vy)
 
     def __str__(self):
         return 'Circle({},{},{})'.format(*self.npa)
@@ -1,17 +1,16 @@
 """Graphical user interface"""
 
-from concurrent.futures import ThreadPoolExecutor
 import time
 import tkinter as tk
 from tkinter import filedialog
-import numpy as np
+import math
 import json
 
 from .util import log
 from .config import Config
 from .game import Game
 from .spaceview import SpaceView
-from .tkutil import Container
+from .tkutil import Container, Worker
 
 
 def sliderRow(frame, **desc):
@@ -152,10 +151,11 @@ class Clock(Container):
         Container.__init__(self, parent)
 
         self.textVar = self.app.textVariables['gameTime']
+        self.lastSeconds = None
         self.label = tk.Label(self.frame,
                               width=18,
                               textvariable=self.textVar,
-                              bg=Config.colors['clockBackground'].tkString())
+                              bg=Config.tkColors['clockBackground'])
         self.app.components.Clock = self
 
     def layout(self):
@@ -163,12 +163,15 @@ class Clock(Container):
 
     def update(self, t):
         t = int(t)
-        m = t // 60
-        h = m // 60
-        cm = m % 60
-        ch = h % 24
-        cd = h // 24
-        self.textVar.set(self.fmtString.format(cd, ch, cm, t % 60))
+        # Setting the variable makes Tk update the label, even if
+        # nothing has changed.
+        if t == self.lastSeconds:
+            return
+        self.lastSeconds = t
+        (m, s) = divmod(t, 60)
+        (h, m) = divmod(m, 60)
+        (d, h) = divmod(h, 24)
+        self.textVar.set(self.fmtString.format(d, h, m, s))
 
 
 class Controls(Container):
@@ -219,7 +222,7 @@ class BottomFrame(Container):
         self.launchButton = tk.Button(self.frame,
                                       text='Launch',
                                       command=self.app.cmd_launchShip,
-                                      bg=Config.colors['launchButton'].tkString())
+                                      bg=Config.tkColors['launchButton'])
 
         (self.thrustSliderLabel, self.thrustSlider) = sliderRow(
                 self.frame,
@@ -257,11 +260,13 @@ class BottomFrame(Container):
         self.zoomWindow = tk.Canvas(self.frame,
                                     width=self.zoomWindowWidth,
                                     height=self.zoomWindowHeight,
-                                    bg=Config.colors['zoomWindowBackground'].tkString())
+                                    bg=Config.tkColors['zoomWindowBackground'])
 
         self.zoomCenterX = int(self.zoomWindowWidth/2)
         self.zoomCenterY = int(self.zoomWindowHeight/2)
         self.zoomArrowLen = self.zoomWindowHeight*0.45
+        # Arrow angle in milliradians, as last drawn
+        self.zoomArrowAngle = None
 
         r = self.zoomWindowHeight*0.35
         self.zoomPlanet = self.zoomWindow.create_oval(
@@ -270,7 +275,7 @@ class BottomFrame(Container):
                 self.zoomCenterX + r,
                 self.zoomCenterY + r,
                 width=Config.zoomCircleLineWidth,
-                outline=Config.colors['zoomOutline'].tkString())
+                outline=Config.tkColors['zoomOutline'])
 
         self.zoomArrow = self.zoomWindow.create_line(
                 self.zoomCenterX,
@@ -280,8 +285,10 @@ class BottomFrame(Container):
                 arrow=tk.LAST,
                 arrowshape=Config.zoomArrowShape,
                 width=Config.zoomArrowWidth,
-                fill=Config.colors['zoomArrow'].tkString())
+                fill=Config.tkColors['zoomArrow'])
 
+        # The zoom window never gets other items, no need for find_all()
+        self.zoomItems = (self.zoomPlanet, self.zoomArrow)
         self.showZoom = True
         self.zoomIsHidden = False
 
@@ -293,7 +300,7 @@ class BottomFrame(Container):
     def makeValueLabel(self, variable):
         return tk.Label(self.frame, width=12,
                         textvariable=self.app.textVariables[variable],
-                        bg=Config.colors['ValueLabelBackground'].tkString())
+                        bg=Config.tkColors['ValueLabelBackground'])
 
     def radioButton(self, var, value, text, cmd):
         return tk.Radiobutton(self.frame,
@@ -349,22 +356,28 @@ class BottomFrame(Container):
     def update(self, gt, orbit):
         if orbit is None:
             if not self.zoomIsHidden:
-                for id in self.zoomWindow.find_all():
+                for id in self.zoomItems:
                     self.zoomWindow.itemconfigure(id, state=tk.HIDDEN)
                 self.zoomIsHidden = True
             return
 
+        # The angle is measured clockwise from the y-axis, so x is
+        # its sine and y its cosine.
         angle = orbit.yAngleAt(gt)
-        angle = np.pi/2 - angle
-        nx = np.cos(angle) * self.zoomArrowLen
-        ny = np.sin(angle) * self.zoomArrowLen
-        self.zoomWindow.coords(self.zoomArrow,
-                               self.zoomCenterX,
-                               self.zoomCenterY,
-                               self.zoomCenterX + nx,
-                               self.zoomCenterY - ny)
+        # Less than a milliradian moves the arrow tip by a fraction
+        # of a pixel, no need to bother Tk with that.
+        q = round(angle*1000)
+        if q != self.zoomArrowAngle:
+            self.zoomArrowAngle = q
+            nx = math.sin(angle) * self.zoomArrowLen
+            ny = math.cos(angle) * self.zoomArrowLen
+            self.zoomWindow.coords(self.zoomArrow,
+                                   self.zoomCenterX,
+                                   self.zoomCenterY,
+                                   self.zoomCenterX + nx,
+                                   self.zoomCenterY - ny)
         if self.zoomIsHidden:
-            for id in self.zoomWindow.find_all():
+            for id in self.zoomItems:
                 self.zoomWindow.itemconfigure(id, state=tk.NORMAL)
         self.zoomIsHidden = False
 
@@ -405,26 +418,33 @@ class GameVariables:
         self.app = app
         self.game = game
         self.text = app.textVariables
+        self.lastText = {}
+
+    def setText(self, name, text):
+        """Set text variable, but only if its value changes"""
+        if self.lastText.get(name) != text:
+            self.text[name].set(text)
+            self.lastText[name] = text
 
     @property
     def usedFuel(self): return self.game.ship.usedFuel
     @usedFuel.setter
-    def usedFuel(self, v): self.text['usedFuel'].set('{:.2f}'.format(v/1000))
+    def usedFuel(self, v): self.setText('usedFuel', '{:.2f}'.format(v/1000))
 
     @property
     def nLaunches(self): return self.game.ship.nLaunches
     @nLaunches.setter
-    def nLaunches(self, v): self.text['nLaunches'].set(str(v))
+    def nLaunches(self, v): self.setText('nLaunches', str(v))
 
     @property
     def nLostShips(self): return self.game.ship.nLost
     @nLostShips.setter
-    def nLostShips(self, v): self.text['nLostShips'].set(str(v))
+    def nLostShips(self, v): self.setText('nLostShips', str(v))
 
     @property
     def flightLength(self): return self.game.ship.flightLength()
     @flightLength.setter
-    def flightLength(self, v): self.text['flightLength'].set('{:.2f}'.format(v/1000))
+    def flightLength(self, v): self.setText('flightLength', '{:.2f}'.format(v/1000))
 
 
 # Dummy class
@@ -470,8 +490,14 @@ class App(Container):
                 'flightLength': tk.StringVar()
                 }
 
+        # Current values of the setting variables. Traces keep them up
+        # to date, so building a game doesn't have to ask Tcl for every
+        # single value.
+        self.settingValues = {}
         for k, var in self.settingVariables.items():
             var.set(settings.get(k))
+            self.settingValues[k] = settings.get(k)
+            var.trace_add('write', lambda *args, k=k: self.onSettingChanged(k))
 
         # TODO make container for this so it's clearer
         # Game control variables
@@ -488,7 +514,7 @@ class App(Container):
 
 
         # Needed to create images asynchronously
-        self.threadPool = ThreadPoolExecutor(max_workers=5)
+        self.worker = Worker(self.frame)
 
         # Widgets
         self.mainFrame = MainFrame(self)
@@ -503,6 +529,16 @@ class App(Container):
 
         self.shouldUpdate = Config.updateInterval          # in ms
         self.atLeastUpdate = self.shouldUpdate*1.15 / 1000 # in s
+        # A stalled frame must not make the game jump ahead
+        self.maxFrameTime = self.shouldUpdate*5 / 1000     # in s
+        # Real time the next tick is due
+        self.nextTick = self.realTime()
+
+        # Don't animate while the window is iconified
+        self.visible = True
+        root = self.frame.master
+        root.bind('<Map>', self.onMap)
+        root.bind('<Unmap>', self.onUnmap)
 
         # How many game seconds pass in one real second
         self.gameTimeFactor = Config.timeFactor
@@ -514,31 +550,37 @@ class App(Container):
     def resetGameCounters(self):
         currentTime = self.realTime()
         self.lastTime = currentTime             # last real time exact
-        self.lastSecond = int(currentTime)      # last real time second
+        self.lastSlowTick = currentTime         # last call of updateSec()
         self.lastGameTime = 0                   # in-game time, exact
         self.lag = 0
 
-    def gameTime(self, t):
-        gt = self.lastGameTime + (t - self.lastTime)*self.gameTimeFactor
-        self.lastGameTime = gt
-        return gt
+    def gameTime(self):
+        """Return current game time (as of the last tick)"""
+        return self.lastGameTime
 
     def layout(self):
         self.mainFrame.position(0, 0)
         self.sideFrame.position(0, 1)
 
+    def onSettingChanged(self, k):
+        self.settingValues[k] = self.settingVariables[k].get()
+
     def resetTextVariables(self):
         self.textVariables['nLostShips'].set('0')
         self.textVariables['nLaunches'].set('0')
         self.textVariables['flightLength'].set('0')
         self.textVariables['usedFuel'].set('0')
         self.textVariables['gameTime'].set('00d 00h 00m 00s')
+        # Values were set directly, forget what the setters remember
+        self.components.Clock.lastSeconds = None
+        if self.gameVariables is not None:
+            self.gameVariables.lastText.clear()
 
     def buildGame(self):
         log('App', 'Creating new game')
-        for k, var in self.settingVariables.items():
-            log('App', 'Setting {} to {}'.format(k, var.get()))
-            self.settings.set(k, var.get())
+        for k, v in self.settingValues.items():
+            log('App', 'Setting {} to {}'.format(k, v))
+            self.settings.set(k, v)
 
         log('App', 'Building new game')
         game = Game(self.settings)
@@ -587,7 +629,7 @@ class App(Container):
         if len(path) == 0:
             return
 
-        d = {k: v.get() for k, v in self.settingVariables.items()}
+        d = dict(self.settingValues)
         try:
             with open(path, 'w') as f:
                 json.dump(d, f)
@@ -597,31 +639,72 @@ class App(Container):
         for k, var in self.settingVariables.items():
             var.set(self.settings.get(k))
 
+    def onMap(self, event):
+        # The toplevel also gets the events of all its children
+        if event.widget is self.frame.master:
+            self.visible = True
+
+    def onUnmap(self, event):
+        if event.widget is self.frame.master:
+            self.visible = False
+
     def tick(self):
         t = self.realTime()
+        if not self.visible:
+            # Just wait for the window to come back. The game is paused
+            # meanwhile.
+            self.lastTime = t
+            self.nextTick = t
+            self.frame.after(Config.hiddenUpdateInterval, self.tick)
+            return
+
         diff = t - self.lastTime
         if diff > self.atLeastUpdate:
             self.lag += (diff - self.atLeastUpdate)
 
         game = self.game
         if game is not None and self.animating:
-            gt = self.gameTime(t)
-            ts = int(t)
-            if ts != self.lastSecond:
-                self.updateSec(gt, diff)
-                self.lastSecond = ts
-
-            poleVecs = game.update(gt)
-            self.updateSpaceView(gt, poleVecs)
+            # Game time only advances here
+            gt = self.lastGameTime + min(diff, self.maxFrameTime)*self.gameTimeFactor
+            self.lastGameTime = gt
+            self.updateSpaceView(gt, game.update(gt))
             orbit = game.ship.orbit()
             if orbit is not None:
                 self.updateZoom(gt, orbit)
 
         self.lastTime = t
-        self.frame.after(self.shouldUpdate, self.tick)
+        # The slow bookkeeping rides along, no need for a second timer
+        if t - self.lastSlowTick >= Config.slowUpdateInterval/1000:
+            self.tickSlow(t)
+        self.scheduleTick()
+
+    def scheduleTick(self):
+        """Schedule next tick relative to when this one was due
+
+        This way the time spent in tick() doesn't add up to a drift.
+        """
+        now = self.realTime()
+        nextTick = self.nextTick + self.shouldUpdate/1000
+        delay = int((nextTick - now)*1000)
+        if delay < 1:
+            # We are behind, don't try to catch up with a burst of ticks
+            nextTick = now
+            delay = 1
+        self.nextTick = nextTick
+        self.frame.after(delay, self.tick)
+
+    def tickSlow(self, t):
+        """Bookkeeping that doesn't have to be done every frame
+
+        Called from tick() every Config.slowUpdateInterval ms.
+        """
+        if self.game is not None and self.animating:
+            # Only read game time, tick() advances it
+            self.updateSec(self.lastGameTime, t - self.lastSlowTick)
+        self.lastSlowTick = t
 
     def updateSec(self, gt, diff):
-        """Update running game
+        """Update running game (every Config.slowUpdateInterval ms)
             @gt      game time
             @diff    exact time since last call
         """
@@ -637,8 +720,7 @@ class App(Container):
         if orbit is None:
             return
         planet = orbit.body
-        t = self.realTime()
-        gt = self.gameTime(t)
+        gt = self.gameTime()
         ev = planet.escapeSpeed(self.game.universe.gravity)
         self.game.launchShip(gt, Config.scaleFunc(ev, self.s_shipThrust.get()))
 
@@ -7,12 +7,13 @@ of all bodies combined at this point.
 """
 
 
+import math
 import numpy as np
 
 from .geometry import Point, Vector, Circle
 from .config import Config
 from .util import log
-import src.phylib as phylib
+from . import phylib
 
 
 class Body(Circle):
@@ -38,7 +39,7 @@ class Body(Circle):
         self.pos = self.center
         self.rotation = rotation
         self.density = density
-        self.mass = density*np.pi*np.power(radius, 3)*4/3
+        self.mass = density*math.pi*radius**3*4/3
         self.poleOrbit = self.orbit(0, 0)
 
     def polePointAt(self, t):
@@ -148,9 +149,7 @@ class Universe:
         self.aVec *= self.aBuf[:, np.newaxis]
         # Now we just need to sum all gravitational forces into one vector.
         self.aVec.sum(axis=0, out=self.aRes)
-        gv.x = self.aRes[0]
-        gv.y = self.aRes[1]
-        return gv
+        return gv.set(self.aRes[0], self.aRes[1])
 
     def createGravityMatrix(self, nRows, nCols):
         """Create a matrixes holding (absolute) gravity values / vectors
@@ -159,30 +158,36 @@ class Universe:
             @nCols     number of columns
         """
 
-        gravMat = np.zeros((nRows, nCols), dtype=np.double)
-        gravVec = np.zeros((nRows, nCols, 2), dtype=np.double)
-
-        gv = Vector(0, 0)  # buffer
-        pos = Point(0, 0)  # buffer
-
         dx = self.rect.width()/nCols
         dy = self.rect.height()/nRows
 
         x0 = dx/2  # middle of cell
         y0 = dy/2
-        for row in range(nRows):
-            for col in range(nCols):
-                pos.x = x0 + col*dx
-                pos.y = y0 + row*dy
-                gv = self.gravityVector(pos, gv)
-                gravMat[row, col] = gv.abs()
-                gravVec[row, col] = (gv.x, gv.y)
+        xs = x0 + np.arange(nCols)*dx
+        ys = y0 + np.arange(nRows)*dy
+
+        # Same as .gravityVector(), but for all cells at once.
+        # Vectors from each cell to each body, shape (nRows, nCols, nBodies)
+        shape = (nRows, nCols, len(self.bodies))
+        vx = np.subtract(self.bodyPos[:,0], xs[np.newaxis,:,np.newaxis],
+                         out=np.zeros(shape, dtype=np.double))
+        vy = np.subtract(self.bodyPos[:,1], ys[:,np.newaxis,np.newaxis],
+                         out=np.zeros(shape, dtype=np.double))
+        f = np.hypot(vx, vy)
+        f **= 3
+        np.divide(self.aMassG, f, out=f)
+        vx *= f
+        vy *= f
+
+        gravVec = np.zeros((nRows, nCols, 2), dtype=np.double)
+        vx.sum(axis=2, out=gravVec[:,:,0])
+        vy.sum(axis=2, out=gravVec[:,:,1])
+        gravMat = np.hypot(gravVec[:,:,0], gravVec[:,:,1])
 
         self.gravityMatrix = gravMat
         self.gravityVectorMatrix = gravVec
         (self.gravVectorGridX,
-         self.gravVectorGridY) = np.meshgrid([x0 + float(x)*dx for x in range(nCols)],
-                                            [y0 + float(y)*dy for y in range(nRows)])
+         self.gravVectorGridY) = np.meshgrid(xs, ys)
         self.gravVectorGridX *= dx
         self.gravVectorGridY *= dy
 
@@ -194,8 +199,11 @@ class ObjectPath:
         self.startTime = startTime
         self.endTime = np.Inf
 
-    def positionAt(self, t):
-        """Return position of object at time t"""
+    def positionAt(self, t, out=None):
+        """Return position of object at time t
+
+        If a Point out is given, the position is stored there.
+        """
         raise NotImplementedError()
 
     def length(self):
@@ -229,8 +237,8 @@ class SurfaceOrbit(ObjectPath):
         # Angle relative to y-axis
         self.pAngle = pAngle
 
-    def positionAt(self, t):
-        return self.circle.pointAtAngle(self.yAngleAt(t))
+    def positionAt(self, t, out=None):
+        return self.circle.pointAtAngle(self.yAngleAt(t), out)
 
     def yAngleAt(self, t):
         return self.body.bodyAngleAt(t) + self.pAngle
@@ -263,19 +271,29 @@ class SurfaceOrbit(ObjectPath):
 
 
 class TrajectoryState:
-    """Helper class for calculating trajectories"""
+    """Helper class for calculating trajectories
+
+    The state is kept in one array (xPos, yPos, xVel, yVel, path length),
+    .pos and .velocity are views into that array.
+    """
 
     def __init__(self, time, seg):
+        self.seg = np.zeros(5, dtype=np.double)
+        self.pos = Point(self.seg[0:2])
+        self.velocity = Vector(self.seg[2:4])
         self.fill(time, seg)
 
+    @property
+    def length(self): return self.seg[4]
+    @length.setter
+    def length(self, v): self.seg[4] = v
+
     def fill(self, time, seg):
         self.time = time
-        self.pos = Point(seg[0], seg[1])
-        self.velocity = Vector(seg[2], seg[3])
-        self.length = seg[4]
+        self.seg[:] = seg
 
     def segment(self):
-        return (self.pos.x, self.pos.y, self.velocity.x, self.velocity.y, self.length)
+        return self.seg
 
 
 class Trajectory(ObjectPath):
@@ -409,7 +427,7 @@ class Trajectory(ObjectPath):
             return
         self.calculate(t)
 
-    def positionAt(self, t):
+    def positionAt(self, t, out=None):
         if t < self.startTime or t > self.endTime:
             return None
         last = len(self.time) - 1
@@ -420,10 +438,10 @@ class Trajectory(ObjectPath):
 
         # Try this first, because this will be most often true
         if t >= self.time[last - 1]:
-            return self.segmentPoint(last - 1, t)
+            return self.segmentPoint(last - 1, t, out)
 
         i = self.getSegmentIndex(t)
-        return self.segmentPoint(i, t)
+        return self.segmentPoint(i, t, out)
 
     def getSegmentIndex(self, t):
         """Return segment index such that segStart <= t <= segEnd"""
@@ -431,7 +449,7 @@ class Trajectory(ObjectPath):
         assert 0 <= i < len(self.time) - 1
         return i
 
-    def segmentPoint(self, index, t):
+    def segmentPoint(self, index, t, out=None):
         """Return position at time t, when segStart <= time <= segEnd"""
         assert self.time[index] <= t <= self.time[index + 1]
         # Since v1*d + v2*(1-d) gives a point between v1 and v2
@@ -440,8 +458,11 @@ class Trajectory(ObjectPath):
         d2 = self.time[index + 1] - t
         d = d1/(d1 + d2)
         seg = self.segments
-        return Point(seg[index, 0] * (1 - d) + seg[index + 1, 0] * d,
-                     seg[index, 1] * (1 - d) + seg[index + 1, 1] * d)
+        x = seg[index, 0] * (1 - d) + seg[index + 1, 0] * d
+        y = seg[index, 1] * (1 - d) + seg[index + 1, 1] * d
+        if out is None:
+            return Point(x, y)
+        return out.set(x, y)
 
     def calculate(self, targetTime):
         """Calculate trajectory segments until targetTime
@@ -515,15 +536,18 @@ class Trajectory(ObjectPath):
         # adjust values for landing spot
         d = lState.pos.distance(m)/lState.pos.distance(state.pos)
         state.time = lState.time + (state.time - lState.time)*d
-        state.pos = lState.pos*(1 - d) + state.pos*d
+        # pos = lPos + (pos - lPos)*d, without temporary Points
+        state.pos -= lState.pos
+        state.pos *= d
+        state.pos += lState.pos
         # Since we landed, velocity is zero
-        state.velocity = Vector(0, 0)
+        state.velocity.npa[:] = 0
         state.length = lState.length + (state.length - lState.length)*d
         return (d, yAngle)
 
     def vError(self, force, velocity):
         """Calculates the area of the parallelogram spanned by the two vectors"""
-        return np.abs(force.x*velocity.y - force.y*velocity.x)
+        return abs(force.x*velocity.y - force.y*velocity.x)
 
     def calculateSegment(self, state):
         """Calculate one segment of the trajectory
@@ -598,7 +622,7 @@ class Trajectory(ObjectPath):
                 err = self.vError(aGrav, dVel)
                 if err < self.max_err:
                     break
-                dml = np.hypot(dmx, dmy)
+                dml = math.hypot(dmx, dmy)
                 if dml < self.min_seg_calc:
                     break
                 ndt *= 0.66
@@ -1,10 +1,9 @@
 """spaceview.py - a widget that displays our universe"""
 
-try:
-    from traceback import TracebackException
-except: pass
+from itertools import compress, chain
 import tkinter as tk
 import numpy as np
+from PIL.ImageTk import PhotoImage as tkPhotoImage
 
 from .tkutil import Container, CanvasObject
 from .visual import createHeatmap, createVectorPlot
@@ -15,6 +14,17 @@ from .util import log
 
 FGTAG = 'fg'    # tag for all objects above background images
 
+# Tcl procedure to move canvas items given by two points each.
+#   canvas     Tcl name of the canvas
+#   ids        list of item ids
+#   coords     flat list with x0 y0 x1 y1 for each item
+MOVEPROC = 'gravityMoveItems'
+MOVEPROCDEF = '''proc %s {canvas ids coords} {
+    foreach id $ids {x0 y0 x1 y1} $coords {
+        $canvas coords $id $x0 $y0 $x1 $y1
+    }
+}''' % MOVEPROC
+
 
 class SpaceView(Container):
     """Universe display
@@ -33,34 +43,65 @@ class SpaceView(Container):
         self.c2u = 1/self.u2c
         self.cWidth = Config.canvasWidth
         self.cHeight = Config.canvasHeight
-        self.cColor = Config.colors['canvasBackground'].tkString()
+        self.cColor = Config.tkColors['canvasBackground']
         self.canvas = tk.Canvas(self.frame,
                                 width=self.cWidth,
                                 height=self.cHeight,
                                 bg=self.cColor)
+        # Tcl name of the canvas, needed for batched updates
+        self.canvasPath = str(self.canvas)
+        self.tkCall = self.canvas.tk.call
+        self.canvas.tk.eval(MOVEPROCDEF)
 
         self.images = {
                 'gravity': None,
                 'vectors': None
         }
-        self.imageLoader = self.app.threadPool
-        self.loadingHeatmap = None
-        self.loadingVecors = None
+        self.imageToggles = {
+                'gravity': self.app.toggleShowGravity,
+                'vectors': self.app.toggleShowVectors
+        }
+        # One PhotoImage per background image, created on the first
+        # install. Later universes paste their pixels into it, so Tk
+        # keeps its image buffer. A restart keeps the universe and its
+        # images as they are.
+        self.photoImages = {}
+        # Canvas item each PhotoImage was last set on
+        self.photoItems = {}
+        self.imageLoader = self.app.worker
+        # Images that still have to be rendered: name -> (func, args).
+        # They are only rendered once they are shown for the first time.
+        self.imageJobs = {}
+        # Pending redraw (see update())
+        self.drawPending = False
+        self.drawArgs = None
         self.app.components.SpaceView = self
 
     def uni2canvas(self, up, cp):
-        cp.x = up.x*self.u2c
-        cp.y = self.cHeight - up.y*self.u2c
-        return cp
+        return cp.set(up.x*self.u2c, self.cHeight - up.y*self.u2c)
 
     def canvas2uni(self, cp, up):
-        up.x = cp.x*self.c2u
-        up.y = (self.cHeight - cp.y)*self.c2u
-        return up
+        return up.set(cp.x*self.c2u, (self.cHeight - cp.y)*self.c2u)
 
     def reset(self, game):
-        for id in self.canvas.find_all():
-            self.canvas.delete(id)
+        self.drawArgs = None
+        if game.universe is not None and game.universe is self.universe:
+            # Restarted game: bodies and background images stay as they
+            # are, only the ship is new.
+            log('SpaceView', 'Resetting ship view')
+            self.game = game
+            self.shipView.ship = game.ship
+            self.shipView.coords(0, self.aShipBox)
+            self.aDrawnCoords[-1] = self.aShipCoords
+            self.canvas.coords(self.shipView.id, *self.aShipCoords.tolist())
+            return
+
+        self.canvas.delete('all')
+        # Invisible item marking the top of the background layer.
+        # Everything created later is above it, background images go
+        # below it. Lowering an image below a single known item doesn't
+        # need to search the canvas for FGTAG items.
+        self.zSentinel = self.canvas.create_line(0, 0, 0, 0, state=tk.HIDDEN)
         self.game = game
         self.universe = game.universe
         self.bodyViews = []
@@ -68,116 +109,184 @@ class SpaceView(Container):
         self.shipView = None
         self.images['gravity'] = None
         self.images['vectors'] = None
-        if self.loadingHeatmap is not None:
-            self.loadingHeatmap.cancel()
-            self.loadingVecors = None
-        if self.loadingVecors is not None:
-            self.loadingVecors.cancel()
-            self.loadingVecors = None
+        self.imageJobs = {}
 
         if game.universe is not None:
-            log('SpaceView', 'Creating background images')
-            self.createBackgroundImages()
             log('SpaceView', 'Creating body views')
             self.createBodyViews()
             log('SpaceView', 'Creating ship view')
             self.createShipView(game.ship)
+            # Background images are placed below the body views
+            log('SpaceView', 'Creating background images')
+            self.createBackgroundImages()
 
-    def createGravityHeatmap(self, gravLogValues):
+    # The next two methods run in the worker thread. They must not touch
+    # Tk, the result is handed to installImage() in the Tk thread.
+    def createGravityHeatmap(self, universe, gravLogValues):
+        if universe is not self.universe:
+            # universe has changed in the meantime
+            return None
         log('SpaceView', 'Creating gravity heatmap')
-        self._gravityImage = createHeatmap(self.cWidth, self.cHeight, gravLogValues)
-
-        # Tkinter's default anchor is the middle of the image
-        if self.app.toggleShowGravity.get() == 1:
-            gravState = tk.NORMAL
-        else:
-            gravState = tk.HIDDEN
-        img = self.canvas.create_image(self.cWidth/2,
-                                 self.cHeight/2,
-                                 image=self._gravityImage,
-                                 state=gravState)
-
-        self.canvas.tag_lower(img, FGTAG)
-        self.images['gravity'] = img
+        img = createHeatmap(self.cWidth, self.cHeight, gravLogValues)
         log('SpaceView', 'Creating gravity heatmap ... done')
+        return (universe, 'gravity', img)
 
-    def createVectorImage(self, gravLogVectors, gravity):
+    def createVectorImage(self, universe, gridX, gridY, vectorMatrix, realGravMatrix, gravLogValues):
+        if universe is not self.universe:
+            return None
         log('SpaceView', 'Creating Vector field image')
-        self._vectorImage = createVectorPlot(self.cWidth,
-                                             self.cHeight,
-                                             self.universe.gravVectorGridX,
-                                             self.universe.gravVectorGridY,
-                                             gravLogVectors,
-                                             'r')
-
-        if self.app.toggleShowVectors.get() == 1:
-            vecState = tk.NORMAL
+        # Scale vectors to log(g)/g, both components in one pass
+        factors = np.divide(gravLogValues, realGravMatrix)
+        gravLogVectors = np.empty(vectorMatrix.shape, dtype=np.float32)
+        np.multiply(vectorMatrix, factors[:,:,np.newaxis], out=gravLogVectors)
+        img = createVectorPlot(self.cWidth,
+                               self.cHeight,
+                               gridX,
+                               gridY,
+                               gravLogVectors,
+                               Config.tkColors['gravityVector'])
+        log('SpaceView', 'Creating Vector field image ... done')
+        return (universe, 'vectors', img)
+
+    def installImage(self, result):
+        """Show a rendered image (runs in the Tk thread)"""
+        if result is None:
+            return
+        (universe, name, img) = result
+        if universe is not self.universe:
+            return
+        photo = self.photoImages.get(name)
+        if photo is None:
+            self.photoImages[name] = tkPhotoImage(img)
         else:
-            vecState = tk.HIDDEN
+            photo.paste(img)
+        self.setImage(name)
+
+    def createImageItem(self, name):
+        """Create the canvas item for a background image
+
+        The item is created right away, without an image, so that it
+        gets its place below all foreground objects. The image is set
+        once it has been rendered (see setImage()).
+        """
+        if self.imageToggles[name].get() == 1:
+            state = tk.NORMAL
+        else:
+            state = tk.HIDDEN
+        # Tkinter's default anchor is the middle of the image
         img = self.canvas.create_image(self.cWidth/2,
                                        self.cHeight/2,
-                                       image=self._vectorImage,
-                                       state=vecState)
+                                       state=state)
+        # The heatmap goes to the very bottom, the vectors just above it
+        if name == 'gravity':
+            self.canvas.tag_lower(img)
+        else:
+            self.canvas.tag_lower(img, self.zSentinel)
+        self.images[name] = img
 
-        # Move the image just above the heatmap
-        self.canvas.tag_raise(img, self.images['gravity'])
-        self.images['vectors'] = img
-        log('SpaceView', 'Creating Vector field image ... done')
+    def setImage(self, name):
+        """Show a background image in its canvas item"""
+        item = self.images[name]
+        if self.photoItems.get(name) != item:
+            self.canvas.itemconfigure(item, image=self.photoImages[name])
+            self.photoItems[name] = item
 
     def createBackgroundImages(self):
         # Use logarithmic scale here, otherwise we don't get a useful
         # picture.
         log('SpaceView', 'Calculating numpy matrices')
-        realGravMatrix = self.universe.gravityMatrix
+        # Single precision is plenty for pictures
+        realGravMatrix = self.universe.gravityMatrix.astype(np.float32)
         gravLogValues = np.log(realGravMatrix)
-        d = gravLogValues / realGravMatrix
-        gravLogVectors = self.universe.gravityVectorMatrix.copy()
-        gravLogVectors[:,:,0] *= d
-        gravLogVectors[:,:,1] *= d
-        log('SpaceView', 'Calculating numpy matrices ... done')
 
-        self.loadingHeatmap = self.imageLoader.submit(self.createGravityHeatmap,
-                                                      gravLogValues)
-        self.loadingVecors = self.imageLoader.submit(self.createVectorImage,
-                                                     gravLogVectors,
-                                                     self.loadingHeatmap)
+        universe = self.universe
+        self.imageJobs = {
+                'gravity': (self.createGravityHeatmap,
+                            (universe, gravLogValues)),
+                'vectors': (self.createVectorImage,
+                            (universe,
+                             self.universe.gravVectorGridX,
+                             self.universe.gravVectorGridY,
+                             self.universe.gravityVectorMatrix,
+                             realGravMatrix,
+                             gravLogValues))
+        }
+        log('SpaceView', 'Calculating numpy matrices ... done')
 
-        def logError(future):
-            if future.exception() is not None:
-                log('SpaceView', 'ERROR creating images.')
-                try:
-                    tbe = TracebackException.from_exception(future.exception())
-                    log('SpaceView', ''.join(tbe.format()))
-                except: pass
+        for name in ('gravity', 'vectors'):
+            self.createImageItem(name)
+            if self.imageToggles[name].get() == 1:
+                self.renderImage(name)
 
-        self.loadingHeatmap.add_done_callback(logError)
-        self.loadingVecors.add_done_callback(logError)
+    def renderImage(self, name):
+        """Start rendering a background image, unless that's done already"""
+        job = self.imageJobs.pop(name, None)
+        if job is not None:
+            (func, args) = job
+            self.imageLoader.submit(func, self.installImage, *args)
 
     def createBodyViews(self):
         bodies = self.universe.bodies
 
-        def createView(index, body, col, rotating):
-            bv = BodyView(body, Config.colors[col], self.uni2canvas, self.u2c)
+        colors = Config.tkColors
+        rotorColor = colors['planetRotor']
+
+        def createView(index, body, col, outline, rotating):
+            bv = BodyView(body,
+                          colors[col],
+                          colors[outline],
+                          rotorColor if rotating else None,
+                          self.uni2canvas,
+                          self.u2c)
             bv.draw(self.canvas)
             self.bodyViews.append(bv)
             if rotating:
                 self.movingBodyViews.append((index, bv))
 
-        createView(0, bodies[0], 'startPlanet', True)
-        createView(1, bodies[1], 'targetPlanet', True)
+        createView(0, bodies[0], 'startPlanet', 'planetOutline', True)
+        createView(1, bodies[1], 'targetPlanet', 'planetOutline', True)
         for i, body in enumerate(bodies[2:]):
             if body.type == 'black':
-                createView(i + 2, body, 'blackPlanet', False)
+                createView(i + 2, body, 'blackPlanet', 'blackPlanetOutline', False)
             else:
-                createView(i + 2, body, 'planet', True)
+                createView(i + 2, body, 'planet', 'planetOutline', True)
+
+        # Rotor data as arrays, so update() can move all rotors at once
+        moving = self.movingBodyViews
+        self.aRotorIndex = np.array([i for i, bv in moving], dtype=int)
+        # (r, -r): canvas y-coordinates increase downwards
+        self.aRotorScale = np.array([(bv.circle.radius, -bv.circle.radius)
+                                     for i, bv in moving]).reshape(-1, 2)
+        self.aRotorPoles = np.zeros((len(moving), 2))
+        # Coordinates of all moving items: one row per rotor
+        # (x0, y0 planet center, x1, y1 pole), the ship in the last row
+        self.aItemCoords = np.zeros((len(moving) + 1, 4))
+        self.aRotorCoords = self.aItemCoords[:-1]
+        self.aShipCoords = self.aItemCoords[-1]
+        # Same data as two points (corners of the ship's box)
+        self.aShipBox = self.aShipCoords.reshape(2, 2)
+        # Coordinates as last sent to Tk, inf until then
+        self.aDrawnCoords = np.full_like(self.aItemCoords, np.inf)
+        # Buffers for finding the items that have moved (see draw())
+        self.aDelta = np.zeros_like(self.aItemCoords)
+        self.aMovedCoords = np.zeros(self.aItemCoords.shape, dtype=bool)
+        self.aMoved = np.zeros(len(self.aItemCoords), dtype=bool)
+        # Same flags as a column, broadcasts over the rows of aItemCoords
+        self.aMovedRows = self.aMoved[:,np.newaxis]
+        for row, (i, bv) in zip(self.aRotorCoords, moving):
+            row[:] = (bv.circle.center.x, bv.circle.center.y)*2
+        self.rotorIDs = tuple(bv.rotID for i, bv in moving)
 
     def createShipView(self, ship):
         sv = ShipView(ship,
                       Config.shipSize,
+                      Config.tkColors['ship'],
+                      Config.tkColors['shipOutline'],
                       self.uni2canvas,
                       self.u2c)
         sv.draw(self.canvas)
         self.shipView = sv
+        self.itemIDs = self.rotorIDs + (sv.id,)
 
     def layout(self):
         self.canvas.grid()
@@ -186,6 +295,7 @@ class SpaceView(Container):
         img = self.images[name]
         if img is not None:
             self.canvas.itemconfigure(img, state=tk.NORMAL)
+            self.renderImage(name)
 
     def hideImage(self, name):
         img = self.images[name]
@@ -193,22 +303,60 @@ class SpaceView(Container):
             self.canvas.itemconfigure(img, state=tk.HIDDEN)
 
     def update(self, gt, polePoints):
-        for i, bv in self.movingBodyViews:
-            bv.update(self.canvas, polePoints[i])
-
-        self.shipView.update(self.canvas, gt)
+        # Only remember the latest state here, the canvas is updated
+        # once Tk is idle. Several updates in between are merged into one.
+        self.drawArgs = (gt, polePoints)
+        if not self.drawPending:
+            self.drawPending = True
+            self.canvas.after_idle(self.draw)
+
+    def draw(self):
+        self.drawPending = False
+        if self.drawArgs is None:
+            return
+        (gt, polePoints) = self.drawArgs
+        self.drawArgs = None
+        coords = self.aRotorCoords
+        poles = self.aRotorPoles
+        # No temporary arrays here, everything goes to preallocated buffers
+        np.take(polePoints, self.aRotorIndex, axis=0, out=poles)
+        poles *= self.aRotorScale
+        np.add(coords[:,:2], poles, out=coords[:,2:])
+        self.shipView.coords(gt, self.aShipBox)
+        # Tk redraws an item even if it moves by a fraction of a pixel.
+        # Most rotors turn that slowly, so only send the items that have
+        # moved by half a pixel since they were last drawn.
+        itemCoords = self.aItemCoords
+        delta = self.aDelta
+        moved = self.aMoved
+        np.subtract(itemCoords, self.aDrawnCoords, out=delta)
+        np.abs(delta, out=delta)
+        np.greater_equal(delta, 0.5, out=self.aMovedCoords)
+        np.any(self.aMovedCoords, axis=1, out=moved)
+        if not moved.any():
+            return
+        np.copyto(self.aDrawnCoords, itemCoords, where=self.aMovedRows)
+        flags = moved.tolist()
+        # Move everything with a single call into Tcl. The numbers are
+        # passed as they are, without formatting a script.
+        self.tkCall(MOVEPROC,
+                    self.canvasPath,
+                    tuple(compress(self.itemIDs, flags)),
+                    tuple(chain.from_iterable(compress(itemCoords.tolist(), flags))))
 
 
 class BodyView(CanvasObject):
     """View responsible for drawing (rotating) bodies
 
         @body        body for this view
-        @color       a Color instance
+        @color       a Tk color string
+        @outline     a Tk color string for the outline
+        @rotorColor  a Tk color string for the rotor, None for no rotor
         @uni2canvas  a function to translate universe coords to canvas coords
         @scale       scale factor  (canvas width / universe width)
     """
 
-    def __init__(self, body, color, uni2canvas, scale):
+    def __init__(self, body, color, outline, rotorColor, uni2canvas, scale):
         self.id = None # filled later
         self.rotID = None # filled later
         self.u2c = uni2canvas
@@ -216,75 +364,60 @@ class BodyView(CanvasObject):
         self.circle = Circle(self.u2c(body.pos, Point(0, 0)), body.radius*scale)
         self.body = body
         self.col = color
-
-
-
-    def drawCircle(self, canvas, r, fill, outline):
-        c = self.circle
-        m = c.center
-        id = canvas.create_oval(m.x - r,
-                                m.y - r,
-                                m.x + r,
-                                m.y + r,
-                                fill=fill,
-                                outline=outline,
-                                tags=FGTAG)
-        return id
+        self.outline = outline
+        self.rotorColor = rotorColor
+        # Bodies don't move, so the bounding box never changes
+        m = self.circle.center
+        r = self.circle.radius
+        self.bbox = (m.x - r, m.y - r, m.x + r, m.y + r)
 
     def drawBody(self, canvas):
-        if self.body.type == 'black':
-            outline = 'blackPlanetOutline'
-        else:
-            outline = 'planetOutline'
-        self.id = self.drawCircle(canvas,
-                                  self.circle.radius,
-                                  self.col.tkString(),
-                                  Config.colors[outline].tkString())
+        self.id = canvas.create_oval(*self.bbox,
+                                     fill=self.col,
+                                     outline=self.outline,
+                                     tags=FGTAG)
 
     def drawRotor(self, canvas):
          c = self.circle.center
          r = self.circle.radius
-         col = Config.colors['planetRotor'].tkString()
          self.rotID = canvas.create_line(c.x,
                                          c.y,
                                          c.x,
                                          c.y - r,
                                          width=2,
-                                         fill=col,
+                                         fill=self.rotorColor,
                                          tags=FGTAG)
 
     def draw(self, canvas):
         self.drawBody(canvas)
-        if self.body.type != 'black':
+        if self.rotorColor is not None:
             self.drawRotor(canvas)
 
-    def update(self, canvas, polePoint):
-        c = self.circle.center
-        r = self.circle.radius
-        canvas.coords(self.rotID,
-                      c.x,
-                      c.y,
-                      c.x + r*polePoint[0],
-                      c.y - r*polePoint[1])
-
 
 class ShipView(CanvasObject):
     """View responsible for drawing the ship
 
         @ship          the ship to display
         @size          size of square around ship display
+        @color         a Tk color string
+        @outline       a Tk color string for the outline
         @uni2canvas    a function to translate universe coords to canvas coords
         @scale         scale factor  (canvas width / universe width)
     """
 
-    def __init__(self, ship, size, uni2canvas, scale):
+    def __init__(self, ship, size, color, outline, uni2canvas, scale):
         self.id = None # filled later
         self.ship = ship
+        self.col = color
+        self.outline = outline
         self.u2c = uni2canvas
         self.scale = scale
         self.size = size
         self.offset = size/2
         self.bufPoint = Point(0, 0)
+        # Corners of the box relative to the ship position
+        self.aCorners = np.array(((-self.offset, -self.offset),
+                                  (self.offset, self.offset)))
 
     def draw(self, canvas):
         p = self.u2c(self.ship.positionAt(0), self.bufPoint)
@@ -293,15 +426,12 @@ class ShipView(CanvasObject):
                                      p.y - off,
                                      p.x + off,
                                      p.y + off,
-                                     fill=Config.colors['ship'].tkString(),
-                                     outline=Config.colors['shipOutline'].tkString(),
+                                     fill=self.col,
+                                     outline=self.outline,
                                      tags=FGTAG)
 
-    def update(self, canvas, gt):
-        p = self.u2c(self.ship.positionAt(gt), self.bufPoint)
-        off = self.offset
-        canvas.coords(self.id,
-                      p.x - off,
-                      p.y - off,
-                      p.x + off,
-                      p.y + off)
+    def coords(self, gt, out):
+        """Store corners of the ship's box at time gt in 2x2 array out"""
+        # Both steps work in the same buffer, no new points per frame
+        p = self.u2c(self.ship.positionAt(gt, self.bufPoint), self.bufPoint)
+        np.add(self.aCorners, p.npa, out=out)
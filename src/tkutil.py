@@ -1,5 +1,12 @@
+try:
+    from traceback import TracebackException
+except: pass
+import queue
+import threading
 import tkinter as tk
 
+from .util import log
+
 class Container:
     """Container for widgets / other containers
 
@@ -92,4 +99,69 @@ class CanvasObject:
     def move(self, vec):
         x, y = vec
         for id in self.ids:
-            self.canvas.move(id, x, y)
\ No newline at end of file
+            self.canvas.move(id, x, y)
+
+
+class Worker:
+    """Runs jobs in a background thread, results are delivered in the Tk thread
+
+        @widget     widget used to schedule the delivery
+
+    Tk must only be used from the thread running the main loop. So the
+    worker thread never touches Tk, it only puts results into a queue.
+    While jobs are outstanding, the Tk thread polls that queue and calls
+    the callbacks.
+    """
+
+    # Time (in ms) between checks for finished jobs
+    pollInterval = 50
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        # Submitted jobs without a delivered result (only used in Tk thread)
+        self.pending = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, func, callback, *args):
+        """Call func(*args) in the worker thread, then callback(result)
+        in the Tk thread
+
+        Must be called from the Tk thread.
+        """
+        self.jobs.put((func, callback, args))
+        self.pending += 1
+        if self.pending == 1:
+            self.widget.after(self.pollInterval, self.deliver)
+
+    def run(self):
+        while True:
+            (func, callback, args) = self.jobs.get()
+            try:
+                result = func(*args)
+            except Exception as e:
+                log('Worker', 'ERROR in background job.')
+                try:
+                    tbe = TracebackException.from_exception(e)
+                    log('Worker', ''.join(tbe.format()))
+                except: pass
+                # Still report back, so the job isn't pending forever
+                (callback, result) = (None, None)
+            self.results.put((callback, result))
+
+    def deliver(self):
+        try:
+            while True:
+                try:
+                    (callback, result) = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending -= 1
+                if callback is not None:
+                    callback(result)
+        finally:
+            # Keep polling, even if a callback has failed
+            if self.pending > 0:
+                self.widget.after(self.pollInterval, self.deliver)
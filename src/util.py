@@ -48,6 +48,15 @@ def randomPointRect(rect):
                  rect.ymin + random.random() * rect.height())
 
 
+def randomPointsRect(rect, n):
+    """Return an array of n random points within the given rectangle"""
+
+    a = np.random.random((n, 2))
+    a *= (rect.width(), rect.height())
+    a += (rect.xmin, rect.ymin)
+    return a
+
+
 def randomPointCircle(circle):
     """Return a random point within the given circle"""
 
@@ -74,9 +83,19 @@ def expScalingFunction(base):
             - is unchanged for s = 0
             - will be larger for larger values of scale
             - will be smalller for smaller values of scale
+
+        Scale values come from sliders, so there are only a few distinct
+        ones. The factors base**scale are therefore looked up in a table,
+        which is filled on first use of each scale value.
         """
+        factors = {}
+
         def scale(value, scale, b=base):
-            return value*pow(b, scale)
+            try:
+                return value*factors[scale]
+            except KeyError:
+                f = factors[scale] = pow(b, scale)
+                return value*f
 
         return scale
 
@@ -1,72 +1,79 @@
-import tempfile
-from matplotlib.figure import Figure as mplFigure
-from matplotlib.backends.backend_agg import FigureCanvasAgg as FigureCanvas
+import numpy as np
+import matplotlib
+# We never show a matplotlib window, make sure no interactive backend
+# gets loaded.
+matplotlib.use('Agg')
+import matplotlib.cm
 import PIL
-from PIL.ImageTk import PhotoImage as tkPhotoImage
-import PIL.ImageEnhance
+import PIL.ImageDraw
 
 
-# This is a bit tricky / ugly.
-# matplotlib does not allow us to specify exact pixel values.
-# So we need to use a hack here.
-def createFigureCanvas(width, height, axes=None):
-    if axes is None:
-        axes = [0., 0., 1., 1.]
-
-    fig = mplFigure(frameon=False)
-    DPI = float(fig.get_dpi())
-
-    fCanvas = FigureCanvas(fig)
-    fig.set_size_inches(width/DPI, height/DPI)
-
-    # We don't want any axes drawn, of course.
-    ax = fig.add_axes(axes)
-    ax.set_axis_off()
-    return (ax, fCanvas, DPI)
-
-
-# This seems to be the only way to get an exact pixel count:
-# Save the image to a file and specify dpi to use.
-def canvasImage(fCanvas, dpi):
-    f = tempfile.TemporaryFile()
-    fCanvas.print_figure(f, dpi=dpi)
-    return PIL.Image.open(f)
+# RGB lookup table for the heatmap colors
+heatmapColors = matplotlib.cm.inferno(np.linspace(0, 1, 256), bytes=True)[:,:3]
 
 
+# No need for a matplotlib figure here: scale the values up to the
+# canvas size, then look up the colors in a table.
+# Like createVectorPlot() this returns a PIL image and doesn't touch Tk,
+# so it can run in any thread.
 def createHeatmap(width, height, values):
-    (ax, fCanvas, dpi) = createFigureCanvas(width, height)
-
-    # cmap sets the used (predefined) colormap
-    ax.matshow(values, cmap='inferno', interpolation='bicubic')
-    img = canvasImage(fCanvas, dpi)
+    img = PIL.Image.fromarray(values.astype(np.float32, copy=False))
+    img = img.resize((width, height), PIL.Image.BICUBIC)
+    vmin = values.min()
+    vmax = values.max()
+    idx = np.asarray(img) - vmin
+    idx *= 256/(vmax - vmin)
+    # bicubic interpolation may overshoot a little
+    np.clip(idx, 0, 255, out=idx)
     # Flip image, because canvas y-coordinates increase downwards...
-    img = img.transpose(PIL.Image.FLIP_TOP_BOTTOM)
-    return tkPhotoImage(img)
+    rgb = heatmapColors[idx[::-1].astype(np.uint8)]
+    return PIL.Image.fromarray(rgb)
 
 
 def createVectorPlot(width, height, gridX, gridY, vectors, col):
-    zx = width*1.1
-    zy = height*1.1
-    dx = zx - width
-    dy = zy - height
+    """Draw the vector field as arrows with PIL
+
+        @width      image width in pixels
+        @height     image height in pixels
+        @gridX      x-coordinates of the grid cells (meshgrid)
+        @gridY      y-coordinates of the grid cells (meshgrid)
+        @vectors    array of shape (rows, cols, 2)
+        @col        arrow color (e.g. '#ff0000')
+    """
+    (nRows, nCols) = gridX.shape
+    # Map the grid onto the image, each arrow starts in the middle of its cell
+    sx = gridX[0, 1] - gridX[0, 0]
+    sy = gridY[1, 0] - gridY[0, 0]
+    px = (gridX - gridX[0, 0] + sx/2) * (width/(sx*nCols))
+    # canvas y-coordinates increase downwards
+    py = height - (gridY - gridY[0, 0] + sy/2) * (height/(sy*nRows))
+
+    # Same automatic scaling as matplotlib's quiver
+    vx = vectors[:,:,0]
+    vy = vectors[:,:,1]
+    lengths = np.hypot(vx, vy)
+    k = width / (1.8*max(10, np.sqrt(vx.size))*lengths.mean())
+    ex = px + vx*k
+    ey = py - vy*k
 
-    (ax, fCanvas, dpi) = createFigureCanvas(width=zx, height=zy)
-    ax.quiver(gridX,
-              gridY,
-              vectors[:,:,0],
-              vectors[:,:,1],
-              angles='xy',
-              facecolor=col,
-              antialiased=True)
+    # Arrow heads: the head is at most half as long as the arrow
+    hl = np.minimum(lengths*k*0.5, 5)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ux = np.nan_to_num(vx/lengths)
+        uy = np.nan_to_num(-vy/lengths)
+    bx = ex - ux*hl
+    by = ey - uy*hl
+    hw = hl*0.6
 
-    img = canvasImage(fCanvas, dpi)
-    img = img.crop((dx/2, dy/2, zx - dx/2, zy - dy/2))
-    meh = PIL.ImageEnhance.Sharpness(img)
-    # Smooth out ugly pixelated arrows
-    img = meh.enhance(0.4)
-    # for some reason, this is exceedingly slow in this case:
-    # self._vectorImage = tkPhotoImage(img)
-    # It has to do with image transparency, which is not really
-    # supported by Tkinter. But I'm not sure about the details.
-    img = img.convert(mode='RGB')
-    return tkPhotoImage(img)
\ No newline at end of file
+    # The transparency of an RGBA image makes tkPhotoImage slow,
+    # so draw onto an opaque background.
+    img = PIL.Image.new('RGB', (width, height), 'white')
+    draw = PIL.ImageDraw.Draw(img)
+    arrows = zip(px.ravel().tolist(), py.ravel().tolist(),
+                 ex.ravel().tolist(), ey.ravel().tolist(),
+                 bx.ravel().tolist(), by.ravel().tolist(),
+                 (uy*hw).ravel().tolist(), (ux*hw).ravel().tolist())
+    for (x0, y0, x1, y1, x2, y2, ox, oy) in arrows:
+        draw.line((x0, y0, x2, y2), fill=col, width=2)
+        draw.polygon((x1, y1, x2 - ox, y2 + oy, x2 + ox, y2 - oy), fill=col)
+    return img